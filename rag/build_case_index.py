@@ -0,0 +1,10 @@
+"""Build the on-disk case index ahead of startup, e.g. from the deploy build step"""
+import sys
+
+from rag_service import CASE_INDEX_DIR, build_case_index, tantivy
+
+if __name__ == "__main__":
+    if tantivy is None:
+        print("tantivy not installed, skipping case index build")
+        sys.exit(0)
+    build_case_index(CASE_INDEX_DIR)
\ No newline at end of file
@@ -1,14 +1,29 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import hashlib
+import heapq
 import os
-import requests
-import json
+import shutil
+import tempfile
+import time
+from contextlib import asynccontextmanager
+import httpx
+import orjson
+from async_lru import alru_cache
 from dotenv import load_dotenv
 import google.generativeai as genai
 import logging
 import re
 
+# Optional on-disk full-text index; falls back to the in-memory inverted index without it
+try:
+    import tantivy
+except ImportError:
+    tantivy = None
+
 # Load environment variables
 load_dotenv()
 
@@ -16,21 +31,84 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="LegalEase RAG Service", version="1.0.0")
+app = FastAPI(title="LegalEase RAG Service", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Configuration
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 INDIAN_KANOON_API_KEY = os.getenv("INDIAN_KANOON_API_KEY")
+IK_MAX_CONCURRENCY = int(os.getenv("IK_MAX_CONCURRENCY", "4"))
+IK_REQUESTS_PER_SECOND = float(os.getenv("IK_REQUESTS_PER_SECOND", "2"))
+CASE_INDEX_DIR = os.getenv("CASE_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "case_index"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "10"))
+GEMINI_RETRY_CONTEXT_CHARS = 1500
+
+# Cap output length so runaway generations don't stretch tail latency
+GEMINI_GENERATION_CONFIG = {"max_output_tokens": 512}
+
+# Fixed assistant instructions, sent as Gemini's system instruction instead of
+# being repeated in every prompt
+SYSTEM_INSTRUCTION = """You are a legal AI assistant for Indian law. Based on the legal case context provided with the user's query, provide a helpful and accurate response to the query.
+
+Please provide:
+1. A direct answer to the query based on the cases shown
+2. Key legal principles that apply
+3. Practical next steps the user should consider
+
+Keep the response professional, concise, and helpful. Always recommend consulting with a qualified legal professional for specific legal advice."""
 
 # Initialize Gemini
 if GOOGLE_API_KEY:
     genai.configure(api_key=GOOGLE_API_KEY)
-    model = genai.GenerativeModel('gemini-1.5-pro-latest')
+    model = genai.GenerativeModel('gemini-1.5-pro-latest', system_instruction=SYSTEM_INSTRUCTION)
     logger.info("Google Gemini API configured successfully")
 else:
     logger.warning("Google API key not found!")
     model = None
 
+# HTTP method accepted by the Indian Kanoon search endpoint (switches to GET after a 405)
+ik_search_method = "POST"
+
+class IndianKanoonBusy(Exception):
+    """Raised when outbound Indian Kanoon calls are saturated"""
+
+class TokenBucket:
+    """Async token bucket that smooths the rate of outbound requests"""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+    
+    def empty(self):
+        self._refill()
+        return self.tokens < 1
+    
+    async def acquire(self):
+        while self.empty():
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+        self.tokens -= 1
+
+# Concurrency cap and rate limit shared by all Indian Kanoon calls (protects the daily quota)
+ik_semaphore = asyncio.Semaphore(IK_MAX_CONCURRENCY)
+ik_bucket = TokenBucket(IK_REQUESTS_PER_SECOND, IK_MAX_CONCURRENCY)
+
+@asynccontextmanager
+async def ik_request_slot():
+    """Reserve a concurrency slot and rate-limit token for an Indian Kanoon call"""
+    # Fail fast when both limits are exhausted so callers fall back to local search
+    if ik_semaphore.locked() and ik_bucket.empty():
+        raise IndianKanoonBusy("Indian Kanoon request limit reached")
+    
+    async with ik_semaphore:
+        await ik_bucket.acquire()
+        yield
+
 # Sample legal cases for demonstration
 SAMPLE_LEGAL_CASES = [
     {
@@ -107,6 +185,109 @@ SAMPLE_LEGAL_CASES = [
     }
 ]
 
+# Word tokenizer shared by case indexing and queries (expects lowercased text)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def _tokens(text_lower: str) -> set:
+    """Split lowercased text into its set of word tokens"""
+    return set(_TOKEN_RE.findall(text_lower))
+
+# Lowercased searchable text and word set for each sample case, computed once at import
+CASE_SEARCH_TEXT = [
+    f"{case['facts']} {case['judgment']} {case['legal_issues']} {case['case_title']}".lower()
+    for case in SAMPLE_LEGAL_CASES
+]
+CASE_TOKENS = [_tokens(text) for text in CASE_SEARCH_TEXT]
+
+# Common words ignored in queries; they match nearly every case and carry no signal
+STOPWORDS = frozenset({"the", "a", "an", "of", "in", "on", "to", "for", "and", "or", "is", "are", "was", "were", "by"})
+
+# Inverted index (word -> positions in SAMPLE_LEGAL_CASES) so searches only
+# touch cases sharing a word with the query
+INVERTED = {}
+for case_index, tokens in enumerate(CASE_TOKENS):
+    for token in tokens:
+        INVERTED.setdefault(token, []).append(case_index)
+
+# Case fields indexed for full-text search in the on-disk index
+CASE_INDEX_FIELDS = ['case_title', 'facts', 'judgment', 'legal_issues']
+
+# On-disk BM25 index over SAMPLE_LEGAL_CASES, built at deploy time and opened on
+# startup when tantivy is available
+fulltext_index = None
+
+CASE_INDEX_TOKENIZER = 'en_stem'
+
+def case_index_fingerprint():
+    """Hash of the index schema and the indexed case text; any change forces a rebuild"""
+    digest = hashlib.sha256()
+    digest.update(orjson.dumps([CASE_INDEX_FIELDS, CASE_INDEX_TOKENIZER]))
+    for case in SAMPLE_LEGAL_CASES:
+        digest.update(orjson.dumps([case[field] for field in CASE_INDEX_FIELDS]))
+    return digest.hexdigest()
+
+def _case_index_schema():
+    schema_builder = tantivy.SchemaBuilder()
+    schema_builder.add_unsigned_field('case_id', stored=True)
+    for field in CASE_INDEX_FIELDS:
+        schema_builder.add_text_field(field, tokenizer_name=CASE_INDEX_TOKENIZER)
+    return schema_builder.build()
+
+def _read_case_index_fingerprint(path: str):
+    try:
+        with open(os.path.join(path, 'fingerprint')) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+def build_case_index(path: str):
+    """Build the on-disk case index at path (run at deploy time via build_case_index.py)"""
+    # Results map back through case_id positions, so edits or reorders of the
+    # corpus (not just count changes) must invalidate the index
+    fingerprint = case_index_fingerprint()
+    existing = _read_case_index_fingerprint(path)
+    if existing == fingerprint:
+        logger.info("Case index at %s is up to date", path)
+        return
+    if existing is None and os.path.isdir(path) and os.listdir(path):
+        # No fingerprint means we didn't build it; never delete someone else's data
+        raise RuntimeError(f"Refusing to replace non-empty directory {path} that has no case index fingerprint")
+    
+    # Build beside the target and swap it in, so a reader never sees a half-built index
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix='.case_index-build-', dir=parent)
+    try:
+        logger.info("Building case index at %s", path)
+        index = tantivy.Index(_case_index_schema(), path=build_dir)
+        writer = index.writer()
+        for case_id, case in enumerate(SAMPLE_LEGAL_CASES):
+            writer.add_document(tantivy.Document(case_id=case_id, **{field: case[field] for field in CASE_INDEX_FIELDS}))
+        writer.commit()
+        writer.wait_merging_threads()
+        with open(os.path.join(build_dir, 'fingerprint'), 'w') as f:
+            f.write(fingerprint)
+        
+        if existing is not None:
+            # Our own stale index: move it aside before swapping the new one in
+            old_dir = tempfile.mkdtemp(prefix='.case_index-old-', dir=parent)
+            os.replace(path, old_dir)
+            os.replace(build_dir, path)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            if os.path.isdir(path):
+                os.rmdir(path)
+            os.replace(build_dir, path)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+def open_case_index(path: str):
+    """Open the prebuilt on-disk case index; raises if it is missing or out of date"""
+    if _read_case_index_fingerprint(path) != case_index_fingerprint():
+        raise RuntimeError(f"Case index at {path} is missing or stale, run build_case_index.py")
+    return tantivy.Index.open(path)
+
 class ChatRequest(BaseModel):
     message: str
     user_id: Optional[str] = None
@@ -116,215 +297,282 @@ class ChatResponse(BaseModel):
     sources: List[dict] = []
     success: bool = True
 
-def simple_text_search(query: str, cases: List[dict], top_k: int = 3):
-    """Simple keyword-based search through cases"""
-    query_words = set(query.lower().split())
-    scored_cases = []
+def simple_text_search(query: str, top_k: int = 3):
+    """Keyword-based search through the sample cases (on-disk index if open, else the inverted index)"""
+    # Lowercase once; reused for tokenizing and the phrase check against precomputed text
+    query_lower = query.lower().strip()
+    query_words = _tokens(query_lower) - STOPWORDS
+    if not query_words:
+        return []
     
-    for case in cases:
-        # Create searchable text from case
-        searchable_text = f"{case['facts']} {case['judgment']} {case['legal_issues']} {case['case_title']}".lower()
-        
+    if fulltext_index is not None:
+        try:
+            return search_case_index(query_words, top_k)
+        except Exception as e:
+            logger.error("Error searching case index, using in-memory search: %s", e)
+    
+    # Candidate cases contain at least one query word
+    candidates = set()
+    for word in query_words:
+        candidates.update(INVERTED.get(word, ()))
+    
+    scored_cases = []
+    for case_index in candidates:
         # Count matching words
-        matches = sum(1 for word in query_words if word in searchable_text)
+        matches = len(query_words & CASE_TOKENS[case_index])
         
         # Boost score for exact phrase matches
-        if query.lower() in searchable_text:
+        if query_lower in CASE_SEARCH_TEXT[case_index]:
             matches += 2
-            
-        if matches > 0:
-            scored_cases.append((case, matches))
+        
+        scored_cases.append((case_index, matches))
     
-    # Sort by score and return top results
-    scored_cases.sort(key=lambda x: x[1], reverse=True)
-    return [case for case, score in scored_cases[:top_k]]
+    # Partial sort: highest scores first, ties keep corpus order
+    top = heapq.nlargest(top_k, scored_cases, key=lambda x: (x[1], -x[0]))
+    return [SAMPLE_LEGAL_CASES[i] for i, score in top]
+
+def search_case_index(query_words: set, top_k: int):
+    """BM25-ranked search over the on-disk case index"""
+    # Tokens are plain [a-z0-9] words, so joining them never produces query syntax
+    query = fulltext_index.parse_query(" ".join(sorted(query_words)), CASE_INDEX_FIELDS)
+    searcher = fulltext_index.searcher()
+    hits = searcher.search(query, top_k).hits
+    return [SAMPLE_LEGAL_CASES[searcher.doc(address)['case_id'][0]] for score, address in hits]
 
-def get_indian_kanoon_cases(query: str, limit: int = 5):
-    """Search Indian Kanoon API for relevant cases using their official API"""
+# Field names used by the different Indian Kanoon response formats, in order of preference
+IK_TITLE_KEYS = ('title', 'case_name', 'name')
+IK_DOC_ID_KEYS = ('tid', 'id', 'doc_id')
+IK_HEADLINE_KEYS = ('headline', 'summary', 'description')
+IK_SOURCE_KEYS = ('docsource', 'court', 'source')
+
+def _first(d: dict, keys: tuple, default=''):
+    """Return the first truthy value among keys in d, or default"""
+    for key in keys:
+        value = d.get(key)
+        if value:
+            return value
+    return default
+
+async def get_indian_kanoon_cases(query: str, limit: int = 5, raise_errors: bool = False):
+    """Search Indian Kanoon API for relevant cases, reusing recent results.
+    Failures return [] unless raise_errors is set, so callers can report them."""
     if not INDIAN_KANOON_API_KEY:
         logger.warning("Indian Kanoon API key not available")
         return []
     
     try:
-        # Try POST method first (as per documentation)
-        url = "https://api.indiankanoon.org/search/"
-        headers = {
-            'Authorization': f'Token {INDIAN_KANOON_API_KEY}',
-            'Accept': 'application/json',
-            'Content-Type': 'application/x-www-form-urlencoded',
-            'User-Agent': 'LegalEase-AI/1.0'
-        }
+        # Only whitespace is normalised: the query is sent upstream as typed, and
+        # Indian Kanoon's operators (ANDD/ORR/NOTT) are case-sensitive
+        return await _search_indian_kanoon(" ".join(query.split()), limit)
+    except IndianKanoonBusy as e:
+        logger.warning("Skipping Indian Kanoon search: %s", e)
+        if raise_errors:
+            raise
+        return []
+    except Exception as e:
+        logger.error("Error calling Indian Kanoon API: %s", e)
+        if raise_errors:
+            raise
+        return []
+
+@alru_cache(maxsize=1024, ttl=600)
+async def _search_indian_kanoon(query: str, limit: int):
+    """Search Indian Kanoon API using their official API (failures raise so they are not cached)"""
+    global ik_search_method
+    
+    client = app.state.ik_client
+    
+    # Search parameters (form-encoded for POST, query string for GET)
+    form_data = {
+        'formInput': query,
+        'pagenum': 0
+    }
+    
+    logger.debug("Trying %s to Indian Kanoon API for: %s", ik_search_method, query)
+    
+    async with ik_request_slot():
+        if ik_search_method == "POST":
+            # Try POST method first (as per documentation)
+            response = await client.post("/search/", data=form_data)
+            logger.debug("Indian Kanoon POST response status: %s", response.status_code)
+            
+            if response.status_code == 405:
+                # If POST not allowed, use GET from now on
+                logger.info("POST method not allowed, switching to GET...")
+                ik_search_method = "GET"
         
-        # POST data as form-encoded
-        form_data = {
-            'formInput': query,
-            'pagenum': 0
-        }
+        if ik_search_method == "GET":
+            response = await client.get("/search/", params=form_data)
+            logger.debug("Indian Kanoon GET response status: %s", response.status_code)
+    
+    if response.status_code == 401 or response.status_code == 403:
+        logger.error("Indian Kanoon API authentication failed: %s", response.status_code)
+        logger.error("Response: %s", response.text)
+    elif response.status_code != 200:
+        logger.warning("Indian Kanoon API returned status %s", response.status_code)
+        logger.warning("Response: %s", response.text[:200])
+    response.raise_for_status()
+    
+    try:
+        # Guarded: even lazy formatting would decode and slice the body
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Response preview: %s...", response.text[:300])
         
-        logger.info(f"Trying POST to Indian Kanoon API for: {query}")
-        logger.info(f"Using API key: {INDIAN_KANOON_API_KEY[:15]}...")
+        # Try to parse as JSON
+        try:
+            data = orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            logger.error("Response is not valid JSON")
+            logger.error("Raw response: %s", response.text[:500])
+            raise
         
-        response = requests.post(url, headers=headers, data=form_data, timeout=15)
-        logger.info(f"Indian Kanoon POST response status: {response.status_code}")
+        if logger.isEnabledFor(logging.DEBUG) and isinstance(data, dict):
+            logger.debug("Indian Kanoon JSON response received with keys: %s", list(data.keys()))
         
-        if response.status_code == 405:
-            # If POST not allowed, try GET method
-            logger.info("POST method not allowed, trying GET...")
-            get_url = f"https://api.indiankanoon.org/search/"
-            get_headers = {
-                'Authorization': f'Token {INDIAN_KANOON_API_KEY}',
-                'Accept': 'application/json',
-                'User-Agent': 'LegalEase-AI/1.0'
-            }
-            get_params = {
-                'formInput': query,
-                'pagenum': 0
-            }
-            
-            response = requests.get(get_url, headers=get_headers, params=get_params, timeout=15)
-            logger.info(f"Indian Kanoon GET response status: {response.status_code}")
+        # Parse the response according to their documentation format
+        results = []
         
-        if response.status_code == 200:
-            try:
-                response_text = response.text
-                logger.info(f"Response preview: {response_text[:300]}...")
-                
-                # Try to parse as JSON
-                try:
-                    data = response.json()
-                except json.JSONDecodeError:
-                    logger.error("Response is not valid JSON")
-                    logger.error(f"Raw response: {response_text[:500]}")
-                    return []
-                
-                logger.info(f"Indian Kanoon JSON response received with keys: {list(data.keys())}")
-                
-                # Parse the response according to their documentation format
-                results = []
-                
-                # Check different possible response formats
-                if isinstance(data, list):
-                    # Direct list of cases
-                    docs = data[:limit]
-                elif 'docs' in data:
-                    # Response with 'docs' key
-                    docs = data['docs'][:limit]
-                elif 'results' in data:
-                    # Response with 'results' key
-                    docs = data['results'][:limit]
-                else:
-                    # Try to find any array in the response
-                    for key, value in data.items():
-                        if isinstance(value, list) and len(value) > 0:
-                            docs = value[:limit]
-                            logger.info(f"Found documents under key: {key}")
-                            break
-                    else:
-                        logger.warning(f"Unknown response format: {list(data.keys())}")
-                        return []
-                
-                for doc in docs:
-                    # Handle different document formats
-                    title = doc.get('title', '') or doc.get('case_name', '') or doc.get('name', 'Untitled Case')
-                    doc_id = doc.get('tid', '') or doc.get('id', '') or doc.get('doc_id', '')
-                    headline = doc.get('headline', '') or doc.get('summary', '') or doc.get('description', '')
-                    source = doc.get('docsource', '') or doc.get('court', '') or doc.get('source', 'Indian Kanoon')
-                    
-                    results.append({
-                        'title': title,
-                        'tid': doc_id,
-                        'headline': headline,
-                        'docsource': source,
-                        'docsize': doc.get('docsize', 0),
-                        'url': f"https://indiankanoon.org/doc/{doc_id}/" if doc_id else "",
-                        'summary': headline,
-                        'source': 'Indian Kanoon API'
-                    })
-                
-                logger.info(f"Successfully parsed {len(results)} cases from Indian Kanoon")
-                return results
-                
-            except Exception as parse_error:
-                logger.error(f"Error parsing Indian Kanoon response: {parse_error}")
-                logger.error(f"Response content: {response.text[:500]}")
+        # Check different possible response formats
+        if isinstance(data, list):
+            # Direct list of cases
+            docs = data[:limit]
+        elif 'docs' in data:
+            # Response with 'docs' key
+            docs = data['docs'][:limit]
+        elif 'results' in data:
+            # Response with 'results' key
+            docs = data['results'][:limit]
+        else:
+            # Try to find any array in the response
+            for key, value in data.items():
+                if isinstance(value, list) and len(value) > 0:
+                    docs = value[:limit]
+                    logger.info("Found documents under key: %s", key)
+                    break
+            else:
+                logger.warning("Unknown response format: %s", list(data.keys()))
                 return []
         
-        elif response.status_code == 401 or response.status_code == 403:
-            logger.error(f"Indian Kanoon API authentication failed: {response.status_code}")
-            logger.error(f"Response: {response.text}")
-            return []
-        else:
-            logger.warning(f"Indian Kanoon API returned status {response.status_code}")
-            logger.warning(f"Response: {response.text[:200]}")
-            return []
+        for doc in docs:
+            # Handle different document formats
+            title = _first(doc, IK_TITLE_KEYS, 'Untitled Case')
+            doc_id = _first(doc, IK_DOC_ID_KEYS)
+            headline = _first(doc, IK_HEADLINE_KEYS)
+            source = _first(doc, IK_SOURCE_KEYS, 'Indian Kanoon')
             
-    except Exception as e:
-        logger.error(f"Error calling Indian Kanoon API: {e}")
-        return []
+            results.append({
+                'title': title,
+                'tid': doc_id,
+                'headline': headline,
+                'docsource': source,
+                'docsize': doc.get('docsize', 0),
+                'url': f"https://indiankanoon.org/doc/{doc_id}/" if doc_id else "",
+                'summary': headline,
+                'source': 'Indian Kanoon API'
+            })
+        
+        logger.debug("Successfully parsed %d cases from Indian Kanoon", len(results))
+        return results
+        
+    except Exception as parse_error:
+        logger.error("Error parsing Indian Kanoon response: %s", parse_error)
+        logger.error("Response content: %s", response.text[:500])
+        raise
 
-def get_case_document(doc_id: str):
-    """Get full document content from Indian Kanoon API"""
+async def get_case_document(doc_id: str):
+    """Get full document content from Indian Kanoon API, reusing recent fetches"""
     if not INDIAN_KANOON_API_KEY or not doc_id:
         return None
     
     try:
-        url = f"https://api.indiankanoon.org/doc/{doc_id}/"
-        headers = {
-            'Authorization': f'Token {INDIAN_KANOON_API_KEY}',
-            'Accept': 'application/json'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=15)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            logger.warning(f"Failed to get document {doc_id}: {response.status_code}")
-            return None
-            
+        return await _fetch_case_document(doc_id)
+    except IndianKanoonBusy as e:
+        logger.warning("Skipping Indian Kanoon document %s: %s", doc_id, e)
+        return None
     except Exception as e:
-        logger.error(f"Error getting document {doc_id}: {e}")
+        logger.error("Error getting document %s: %s", doc_id, e)
         return None
 
-def generate_ai_response(query: str, context: str):
+@alru_cache(maxsize=4096, ttl=3600)
+async def _fetch_case_document(doc_id: str):
+    """Fetch a document from Indian Kanoon API (failures raise so they are not cached)"""
+    async with ik_request_slot():
+        response = await app.state.ik_client.get(f"/doc/{doc_id}/")
+    if response.status_code != 200:
+        logger.warning("Failed to get document %s: %s", doc_id, response.status_code)
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+def build_prompt(query: str, context: str):
+    """Build the per-request Gemini prompt; the fixed instructions live in SYSTEM_INSTRUCTION"""
+    return f"User Query: {query}\n\nRelevant Legal Cases:\n{context}"
+
+async def generate_ai_response(query: str, context: str):
     """Generate AI response using Gemini"""
     if not model:
         return generate_fallback_response(query)
     
     try:
-        prompt = f"""
-        You are a legal AI assistant for Indian law. Based on the following legal case context, 
-        provide a helpful and accurate response to the user's query.
-        
-        User Query: {query}
-        
-        Relevant Legal Cases:
-        {context}
-        
-        Please provide:
-        1. A direct answer to the query based on the cases shown
-        2. Key legal principles that apply
-        3. Practical next steps the user should consider
-        
-        Keep the response professional, concise, and helpful. Always recommend consulting with a qualified legal professional for specific legal advice.
-        """
-        
-        response = model.generate_content(prompt)
+        try:
+            response = await asyncio.wait_for(
+                model.generate_content_async(build_prompt(query, context), generation_config=GEMINI_GENERATION_CONFIG),
+                timeout=GEMINI_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            # Retry once with trimmed context; a second timeout falls through to the fallback
+            logger.warning("Gemini timed out after %ss, retrying with shorter prompt", GEMINI_TIMEOUT)
+            response = await asyncio.wait_for(
+                model.generate_content_async(build_prompt(query, context[:GEMINI_RETRY_CONTEXT_CHARS]), generation_config=GEMINI_GENERATION_CONFIG),
+                timeout=GEMINI_TIMEOUT
+            )
         return response.text
+    except TimeoutError:
+        logger.error("Gemini timed out twice after %ss, using fallback response", GEMINI_TIMEOUT)
+        return generate_fallback_response(query)
     except Exception as e:
-        logger.error(f"Error generating AI response: {e}")
+        logger.error("Error generating AI response: %s", e)
         return generate_fallback_response(query)
 
-def generate_fallback_response(query: str):
-    """Generate fallback response when AI fails"""
-    matching_cases = simple_text_search(query, SAMPLE_LEGAL_CASES, 2)
-    if matching_cases:
-        case_summaries = []
-        for case in matching_cases:
-            case_summaries.append(f"• {case['case_title']}: {case['judgment']}")
-        
-        fallback_response = f"""Based on similar legal cases in our database:
+class StreamInterrupted(Exception):
+    """Raised when a Gemini stream ends early after partial output was sent"""
 
-{chr(10).join(case_summaries)}
+async def stream_ai_response(query: str, context: str):
+    """Stream AI response text from Gemini chunk by chunk (raises StreamInterrupted if cut off)"""
+    if not model:
+        yield generate_fallback_response(query)
+        return
+    
+    sent_any = False
+    try:
+        response = await asyncio.wait_for(
+            model.generate_content_async(build_prompt(query, context), generation_config=GEMINI_GENERATION_CONFIG, stream=True),
+            timeout=GEMINI_TIMEOUT
+        )
+        # Each chunk gets its own deadline so a stream stalled mid-generation
+        # can't hold the connection open indefinitely
+        chunks = aiter(response)
+        while True:
+            async with asyncio.timeout(GEMINI_TIMEOUT):
+                chunk = await anext(chunks, None)
+            if chunk is None:
+                break
+            sent_any = True
+            yield chunk.text
+    except TimeoutError:
+        logger.warning("Gemini stream stalled for more than %ss, ending response", GEMINI_TIMEOUT)
+        if sent_any:
+            raise StreamInterrupted(f"Response stalled for more than {GEMINI_TIMEOUT}s")
+        yield generate_fallback_response(query)
+    except Exception as e:
+        logger.error("Error streaming AI response: %s", e)
+        # Only fall back if the client hasn't already received partial output
+        if sent_any:
+            raise StreamInterrupted("Response generation failed")
+        yield generate_fallback_response(query)
+
+# Static parts of the fallback response, built once (this path runs hardest during Gemini outages)
+_FALLBACK_HEADER = "Based on similar legal cases in our database:\n\n"
+_FALLBACK_FOOTER = """
 
 Key considerations for your query about "{query}":
 - Review relevant case law and precedents
@@ -333,83 +581,175 @@ Key considerations for your query about "{query}":
 - Consult with a qualified legal professional for personalized advice
 
 This is based on similar cases and general legal principles. For specific legal advice tailored to your situation, please consult with a practicing lawyer."""
-        return fallback_response
+
+def generate_fallback_response(query: str):
+    """Generate fallback response when AI fails"""
+    matching_cases = simple_text_search(query, 2)
+    if matching_cases:
+        case_summaries = "\n".join(f"• {case['case_title']}: {case['judgment']}" for case in matching_cases)
+        return "".join((_FALLBACK_HEADER, case_summaries, _FALLBACK_FOOTER.format(query=query)))
     else:
         return f"I understand you're asking about: {query}. I recommend consulting with a qualified legal professional who can provide specific advice for your situation."
 
+def log_telemetry(event: str, telemetry: dict):
+    """Log request telemetry; scheduled as a background task after the response is sent"""
+    logger.info("%s: %s", event, telemetry)
+
+class ClientDisconnected(Exception):
+    """Raised by the disconnect watcher to cancel its task group"""
+
+async def watch_disconnect(http_request: Request, interval: float = 0.5):
+    """Poll until the client disconnects, then raise so sibling tasks are cancelled"""
+    while not await http_request.is_disconnected():
+        await asyncio.sleep(interval)
+    raise ClientDisconnected()
+
+async def run_until_disconnect(http_request: Request, *coros):
+    """Run coroutines in one task group; returns their results, or None if the client left first"""
+    disconnected = False
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(coro) for coro in coros]
+            watcher = tg.create_task(watch_disconnect(http_request))
+            await asyncio.wait(tasks)
+            watcher.cancel()
+    except* ClientDisconnected:
+        disconnected = True
+    
+    return None if disconnected else [task.result() for task in tasks]
+
+async def retrieve_chat_context(query: str):
+    """Collect live and local cases for a query and build the prompt context and sources"""
+    # The task group cancels the Indian Kanoon lookup if anything else here fails
+    async with asyncio.TaskGroup() as tg:
+        # Start the Indian Kanoon lookup (primary source) in the background
+        ik_task = tg.create_task(get_indian_kanoon_cases(query, limit=3))
+        
+        # Search the local database as supplement
+        similar_cases = simple_text_search(query, 2)
+    
+    indian_kanoon_cases = ik_task.result()
+    
+    # Prepare context with Indian Kanoon cases taking priority
+    context_parts = []
+    sources = []
+    
+    # Add Indian Kanoon cases first (higher priority)
+    for case in indian_kanoon_cases:
+        context_parts.append(f"""
+LIVE CASE from Indian Kanoon:
+Title: {case['title']}
+Source: {case.get('docsource', 'Indian Kanoon')}
+Summary: {case.get('headline', 'Case summary not available')}
+Document ID: {case.get('tid', 'N/A')}
+""")
+        sources.append({
+            'title': case['title'],
+            'url': case.get('url', ''),
+            'docsource': case.get('docsource', 'Indian Kanoon'),
+            'tid': case.get('tid', ''),
+            'type': 'indian_kanoon',
+            'priority': 'high'
+        })
+    
+    # Add local cases as supplementary context
+    for case in similar_cases:
+        context_parts.append(f"""
+REFERENCE CASE from Database:
+Title: {case['case_title']} ({case['year']})
+Court: {case['court']}
+Facts: {case['facts']}
+Judgment: {case['judgment']}
+Legal Issues: {case['legal_issues']}
+""")
+        sources.append({
+            'title': case['case_title'],
+            'court': case['court'],
+            'year': case['year'],
+            'citation': case.get('citation', 'N/A'),
+            'type': 'local_database',
+            'priority': 'medium'
+        })
+    
+    context = "\n".join(context_parts) if context_parts else "No specific matching cases found."
+    
+    return indian_kanoon_cases, similar_cases, context, sources
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize service on startup"""
+    global fulltext_index
+    
     logger.info("Starting LegalEase RAG Service...")
-    logger.info(f"Loaded {len(SAMPLE_LEGAL_CASES)} sample legal cases")
+    logger.info("Loaded %d sample legal cases", len(SAMPLE_LEGAL_CASES))
+    
+    if tantivy:
+        try:
+            fulltext_index = open_case_index(CASE_INDEX_DIR)
+            logger.info("Case index ready at %s", CASE_INDEX_DIR)
+        except Exception as e:
+            logger.error("Error opening case index, using in-memory search: %s", e)
+    else:
+        logger.warning("tantivy not installed, using in-memory case search")
     if GOOGLE_API_KEY:
         logger.info("Google Gemini API key found")
     if INDIAN_KANOON_API_KEY:
         logger.info("Indian Kanoon API key found")
+    
+    # Single pooled HTTP/2 client so concurrent Indian Kanoon calls (search + document
+    # prefetch) multiplex over kept-alive connections instead of new TLS handshakes
+    app.state.ik_client = httpx.AsyncClient(
+        base_url="https://api.indiankanoon.org",
+        headers={
+            'Authorization': f'Token {INDIAN_KANOON_API_KEY}',
+            'Accept': 'application/json',
+            'User-Agent': 'LegalEase-AI/1.0'
+        },
+        timeout=httpx.Timeout(15.0, connect=3.0),
+        http2=True,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=30.0)
+    )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release resources on shutdown"""
+    await app.state.ik_client.aclose()
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "LegalEase RAG"}
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request, background: BackgroundTasks):
     """Main chat endpoint for legal queries - prioritizes Indian Kanoon API"""
     try:
         query = request.message.strip()
         if not query:
             raise HTTPException(status_code=400, detail="Empty query")
         
-        # First, get live cases from Indian Kanoon API (primary source)
-        indian_kanoon_cases = get_indian_kanoon_cases(query, limit=3)
+        indian_kanoon_cases, similar_cases, context, sources = await retrieve_chat_context(query)
         
-        # Then get similar cases from local database as supplement
-        similar_cases = simple_text_search(query, SAMPLE_LEGAL_CASES, 2)
+        # Generate AI response, prefetching the top live case's full document
+        # alongside it so a follow-up /document request is served from cache.
+        # Both are cancelled if the client disconnects, so abandoned requests
+        # stop spending Gemini quota.
+        coros = [generate_ai_response(query, context)]
+        top_doc_id = indian_kanoon_cases[0].get('tid') if indian_kanoon_cases else None
+        if top_doc_id:
+            coros.append(get_case_document(str(top_doc_id)))
         
-        # Prepare context with Indian Kanoon cases taking priority
-        context_parts = []
-        sources = []
-        
-        # Add Indian Kanoon cases first (higher priority)
-        for case in indian_kanoon_cases:
-            context_parts.append(f"""
-LIVE CASE from Indian Kanoon:
-Title: {case['title']}
-Source: {case.get('docsource', 'Indian Kanoon')}
-Summary: {case.get('headline', 'Case summary not available')}
-Document ID: {case.get('tid', 'N/A')}
-""")
-            sources.append({
-                'title': case['title'],
-                'url': case.get('url', ''),
-                'docsource': case.get('docsource', 'Indian Kanoon'),
-                'tid': case.get('tid', ''),
-                'type': 'indian_kanoon',
-                'priority': 'high'
-            })
+        results = await run_until_disconnect(http_request, *coros)
+        if results is None:
+            logger.info("Client disconnected, cancelled chat for: %s", query)
+            return ChatResponse(response="", sources=[], success=False)
+        ai_response = results[0]
         
-        # Add local cases as supplementary context
-        for case in similar_cases:
-            context_parts.append(f"""
-REFERENCE CASE from Database:
-Title: {case['case_title']} ({case['year']})
-Court: {case['court']}
-Facts: {case['facts']}
-Judgment: {case['judgment']}
-Legal Issues: {case['legal_issues']}
-""")
-            sources.append({
-                'title': case['case_title'],
-                'court': case['court'],
-                'year': case['year'],
-                'citation': case.get('citation', 'N/A'),
-                'type': 'local_database',
-                'priority': 'medium'
-            })
-        
-        context = "\n".join(context_parts) if context_parts else "No specific matching cases found."
-        
-        # Generate AI response
-        ai_response = generate_ai_response(query, context)
+        background.add_task(log_telemetry, "Chat completed", {
+            'query': query,
+            'ik_hits': len(indian_kanoon_cases),
+            'local_hits': len(similar_cases),
+            'response_chars': len(ai_response)
+        })
         
         return ChatResponse(
             response=ai_response,
@@ -418,28 +758,60 @@ Legal Issues: {case['legal_issues']}
         )
         
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {e}")
+        logger.error("Error in chat endpoint: %s", e)
         return ChatResponse(
             response="I apologize, but I encountered an error while processing your request. Please try again or contact support.",
             sources=[],
             success=False
         )
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Streaming chat endpoint - sends sources first, then the answer as Server-Sent Events"""
+    query = request.message.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Empty query")
+    
+    indian_kanoon_cases, similar_cases, context, sources = await retrieve_chat_context(query)
+    
+    async def event_stream():
+        # Sources go out before generation starts so citations render immediately
+        yield b"data: " + orjson.dumps({'sources': sources}) + b"\n\n"
+        truncated = False
+        try:
+            async for delta in stream_ai_response(query, context):
+                yield b"data: " + orjson.dumps({'delta': delta}) + b"\n\n"
+        except StreamInterrupted as e:
+            # Tell the client the answer is cut off rather than complete
+            truncated = True
+            yield b"data: " + orjson.dumps({'error': str(e)}) + b"\n\n"
+        yield b"data: " + orjson.dumps({'done': True, 'truncated': truncated}) + b"\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.get("/search")
-async def search_cases(q: str, limit: int = 10):
+async def search_cases(q: str, background: BackgroundTasks, limit: int = 10):
     """Search endpoint for case research - prioritizes Indian Kanoon API"""
+    # Local database search is cheap and always succeeds, so run it first
+    local_formatted = []
+    for case in simple_text_search(q, min(5, limit)):
+        local_formatted.append({
+            'title': case['case_title'],
+            'court': case['court'],
+            'year': case['year'],
+            'citation': case.get('citation', 'N/A'),
+            'facts': case['facts'],
+            'judgment': case['judgment'],
+            'legal_issues': case['legal_issues'],
+            'source': 'Local Database',
+            'type': 'sample_case'
+        })
+    
+    # Indian Kanoon API (primary source); a failure here leaves the local results intact
+    ik_formatted = []
+    api_error = None
     try:
-        logger.info(f"Search request received: '{q}' with limit {limit}")
-        
-        # First, get cases from Indian Kanoon API (primary source)
-        indian_kanoon_cases = get_indian_kanoon_cases(q, limit=min(8, limit))
-        
-        # Then get some from local database as fallback/supplement
-        local_cases = simple_text_search(q, SAMPLE_LEGAL_CASES, min(5, limit))
-        
-        # Format Indian Kanoon results
-        ik_formatted = []
-        for case in indian_kanoon_cases:
+        for case in await get_indian_kanoon_cases(q, limit=min(8, limit), raise_errors=True):
             ik_formatted.append({
                 'title': case['title'],
                 'tid': case.get('tid', ''),
@@ -451,60 +823,43 @@ async def search_cases(q: str, limit: int = 10):
                 'source': 'Indian Kanoon API',
                 'type': 'live_case'
             })
-        
-        # Format local results
-        local_formatted = []
-        for case in local_cases:
-            local_formatted.append({
-                'title': case['case_title'],
-                'court': case['court'],
-                'year': case['year'],
-                'citation': case.get('citation', 'N/A'),
-                'facts': case['facts'],
-                'judgment': case['judgment'],
-                'legal_issues': case['legal_issues'],
-                'source': 'Local Database',
-                'type': 'sample_case'
-            })
-        
-        results = {
-            'query': q,
-            'indian_kanoon_cases': ik_formatted,
-            'local_cases': local_formatted,
-            'total_results': len(ik_formatted) + len(local_formatted),
-            'primary_source': 'Indian Kanoon API',
-            'api_status': 'active' if indian_kanoon_cases else 'no_results',
-            'success': True
-        }
-        
-        logger.info(f"Search completed: {len(ik_formatted)} from Indian Kanoon, {len(local_formatted)} local")
-        return results
-        
     except Exception as e:
-        logger.error(f"Error in search endpoint: {e}")
-        return {
-            'query': q,
-            'indian_kanoon_cases': [],
-            'local_cases': simple_text_search(q, SAMPLE_LEGAL_CASES, min(5, limit)),
-            'total_results': min(5, limit),
-            'primary_source': 'Local Database Only',
-            'api_status': 'error',
-            'success': False,
-            'error': str(e)
-        }
+        logger.warning("Indian Kanoon search failed for '%s', returning local results only", q)
+        ik_formatted = []
+        api_error = str(e)
+    
+    results = {
+        'query': q,
+        'indian_kanoon_cases': ik_formatted,
+        'local_cases': local_formatted,
+        'total_results': len(ik_formatted) + len(local_formatted),
+        'primary_source': 'Local Database Only' if api_error else 'Indian Kanoon API',
+        'api_status': 'error' if api_error else ('active' if ik_formatted else 'no_results'),
+        'success': True
+    }
+    if api_error:
+        results['error'] = api_error
+    
+    background.add_task(log_telemetry, "Search completed", {
+        'query': q,
+        'limit': limit,
+        'ik_hits': len(ik_formatted),
+        'local_hits': len(local_formatted)
+    })
+    return results
 
 @app.get("/document/{doc_id}")
 async def get_document(doc_id: str):
     """Get full document details"""
     try:
         # Try to get from Indian Kanoon first
-        doc = get_case_document(doc_id)
+        doc = await get_case_document(doc_id)
         if doc:
             return {"success": True, "document": doc, "source": "Indian Kanoon"}
         else:
             return {"success": False, "error": "Document not found"}
     except Exception as e:
-        logger.error(f"Error fetching document {doc_id}: {e}")
+        logger.error("Error fetching document %s: %s", doc_id, e)
         return {"success": False, "error": str(e)}
 
 if __name__ == "__main__":